@@ -1,9 +1,36 @@
 import os
 import re
+import sys
 from collections import defaultdict
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Set
 
+# Prefer RE2's linear-time engine when it is installed (pip install google-re2)
+try:
+    import re2 as _re
+except ImportError:
+    _re = re
+
+# Dates and UUIDs are fixed-shape tokens that never overlap, so they share one
+# sweep. Base64 runs may contain dates/UUIDs, so they get a second sweep over
+# the already-tokenized string together with the numeric sequences.
+_DATE_UUID_RE = _re.compile(
+    r'(?P<date>\d{4}-\d{2}-\d{2})'
+    r'|(?P<uuid>[0-9A-Fa-f]{8}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{12})'
+)
+_B64_NUM_RE = _re.compile(r'(?P<base64>[A-Za-z0-9+/=_-]{20,})|(?P<num>\d+)')
+
+_TOKENS = {
+    'date': '<date>',
+    'uuid': '<uuid>',
+    'base64': '<base64>',
+    'num': '<num>',
+}
+
+def _replace_token(match) -> str:
+    return _TOKENS[match.lastgroup]
+
 class PatternAnalyzer:
     def __init__(self):
         self.patterns = defaultdict(set)
@@ -19,20 +46,24 @@ class PatternAnalyzer:
         # Split filename and extension
         base, ext = os.path.splitext(filename)
         
-        # Replace date patterns (YYYY-MM-DD)
-        base = re.sub(r'\d{4}-\d{2}-\d{2}', '<date>', base)
-        
-        # Replace UUIDs
-        base = re.sub(r'[0-9A-F]{8}-[0-9A-F]{4}-[0-9A-F]{4}-[0-9A-F]{4}-[0-9A-F]{12}', '<uuid>', base, flags=re.IGNORECASE)
+        # Replace date patterns (YYYY-MM-DD) and UUIDs. Both shapes contain at
+        # least two hyphens, so names without them skip the regex entirely.
+        if base.count('-') >= 2:
+            base = _DATE_UUID_RE.sub(_replace_token, base)
         
         # Replace base64-like strings (sequence of alphanumeric and special chars)
-        base = re.sub(r'[A-Za-z0-9+/=_-]{20,}', '<base64>', base)
-        
-        # Replace numeric sequences
-        base = re.sub(r'\d+', '<num>', base)
+        # and numeric sequences
+        base = _B64_NUM_RE.sub(_replace_token, base)
         
         return f"{base}{ext}"
 
+    def _process_dir(self, filenames: List[str]) -> Set[str]:
+        """
+        Extract the set of patterns for the files of a single directory.
+        Patterns are interned so identical ones across directories share storage.
+        """
+        return {sys.intern(self.extract_pattern(filename)) for filename in filenames}
+
     def analyze_directory(self, path: str, max_depth: int = -1) -> Dict[str, Set[str]]:
         """
         Recursively analyze directory and collect file patterns.
@@ -41,6 +72,8 @@ class PatternAnalyzer:
         if max_depth == 0:
             return {}
 
+        # Walk the tree once, collecting the visible files of each directory
+        dir_files = []
         for root, dirs, files in os.walk(path):
             rel_path = os.path.relpath(root, path)
             if rel_path == '.':
@@ -49,11 +82,10 @@ class PatternAnalyzer:
             # Skip hidden directories
             dirs[:] = [d for d in dirs if not d.startswith('.')]
             
-            # Analyze files in current directory
-            for filename in files:
-                if not filename.startswith('.'):  # Skip hidden files
-                    pattern = self.extract_pattern(filename)
-                    self.patterns[rel_path].add(pattern)
+            # Skip hidden files
+            visible_files = [f for f in files if not f.startswith('.')]
+            if visible_files:
+                dir_files.append((rel_path, visible_files))
             
             # If max_depth is specified, remove directories that would exceed it
             if max_depth > 0:
@@ -61,6 +93,12 @@ class PatternAnalyzer:
                 if current_depth >= max_depth:
                     dirs.clear()
 
+        # Analyze directories in parallel; results are merged on this thread
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            results = executor.map(self._process_dir, (files for _, files in dir_files))
+            for (rel_path, _), dir_patterns in zip(dir_files, results):
+                self.patterns[rel_path].update(dir_patterns)
+
         return dict(self.patterns)
 
     def print_tree(self, path: str, max_depth: int = -1):
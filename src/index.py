@@ -2,15 +2,42 @@
 
 import os
 import shutil
+import functools
+import contextlib
 import zipfile
 import logging
 import re
 from datetime import datetime
 from pathlib import Path
 import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+import queue
 from PIL import Image
 import uuid
-import ffmpeg
+
+_IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.webp'})
+_JPEG_EXTENSIONS = frozenset({'.jpg', '.jpeg'})
+
+_DATE_RE = re.compile(r'(\d{4}-\d{2}-\d{2})')
+
+# Memories are named <date>_<uuid>-main.<ext> / <date>_<uuid>-overlay.<ext>
+_MEMORY_RE = re.compile(
+    r'(\d{4}-\d{2}-\d{2})_'
+    r'([0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12})'
+)
+
+# NumPy is optional; it speeds up blending overlays onto opaque images
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# pyvips is optional; fall back to PIL when it or libvips is not installed
+try:
+    import pyvips
+except (ImportError, OSError):
+    pyvips = None
 
 # Set up logging
 logging.basicConfig(
@@ -22,12 +49,180 @@ logging.basicConfig(
     ]
 )
 
+@functools.lru_cache(maxsize=None)
+def _ffmpeg_listing(option):
+    """Return ffmpeg's output for a listing option such as -encoders."""
+    try:
+        result = subprocess.run(
+            ['ffmpeg', '-hide_banner', option],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+    return result.stdout
+
+# Hardware encoders default to a low fixed bitrate, so ask each for constant
+# quality in line with libx264's default CRF 23.
+# VideoToolbox on macOS, NVENC on NVIDIA GPUs
+_HARDWARE_ENCODER_ARGS = {
+    'h264_videotoolbox': ['-q:v', '65'],
+    'h264_nvenc': ['-rc', 'vbr', '-cq', '23', '-b:v', '0'],
+}
+
+# Consumer NVIDIA drivers cap concurrent NVENC sessions, on older drivers at
+# two or three, so GPU encodes run at most this many at once
+_MAX_HARDWARE_ENCODES = 2
+
+def _hardware_video_encoder(exclude=()):
+    """Return a hardware H.264 encoder supported by ffmpeg, if any."""
+    encoders = _ffmpeg_listing('-encoders')
+    for encoder in _HARDWARE_ENCODER_ARGS:
+        if encoder in encoders and encoder not in exclude:
+            return encoder
+    return None
+
+def _cuda_overlay_available():
+    """Check whether ffmpeg can decode, overlay and encode entirely on CUDA."""
+    return (
+        'cuda' in _ffmpeg_listing('-hwaccels')
+        and 'overlay_cuda' in _ffmpeg_listing('-filters')
+        and 'h264_nvenc' in _ffmpeg_listing('-encoders')
+    )
+
+_WINDOWS_ILLEGAL_NAME_CHARS = str.maketrans(':<>|"?*', '_' * 7)
+
+def _member_path(filename):
+    """
+    Return the path, relative to the extraction root, that ZipFile.extract
+    writes a member to. Names are cleaned the same way zipfile does, so
+    absolute paths and '..' parts never leave the extraction root.
+    """
+    arcname = os.path.splitdrive(filename.replace('/', os.path.sep))[1]
+    parts = [
+        part for part in arcname.split(os.path.sep)
+        if part not in ('', os.path.curdir, os.path.pardir)
+    ]
+    if os.path.sep == '\\':
+        # zipfile also replaces illegal characters and trailing dots on Windows
+        parts = [part.translate(_WINDOWS_ILLEGAL_NAME_CHARS).rstrip('.') for part in parts]
+        parts = [part for part in parts if part]
+    return os.path.join(*parts) if parts else ''
+
+def _walk_files(directory, parents=()):
+    """
+    Recursively yield (os.DirEntry, parents) for the files below directory,
+    where parents holds the names of the folders between directory and the file.
+    """
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _walk_files(entry.path, parents + (entry.name,))
+            elif entry.is_file():
+                yield entry, parents
+
+class ExifToolError(RuntimeError):
+    """exiftool reported errors; errors holds its "Error: ... - <file>" lines."""
+
+    def __init__(self, errors):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+class ExifToolDaemon:
+    """
+    A persistent exiftool process that reads commands from stdin.
+    Not thread-safe: SnapchatProcessor lends each daemon to one thread at a time.
+    """
+
+    def __init__(self):
+        self._process = None
+
+    def execute(self, *args):
+        """Run one exiftool command and return its output."""
+        output = self._send(args)
+        if output is None:
+            # exiftool died since the last command; retry once on a fresh process
+            output = self._send(args)
+            if output is None:
+                raise RuntimeError("exiftool exited unexpectedly")
+        
+        errors = [line.strip() for line in output if line.startswith('Error')]
+        if errors:
+            raise ExifToolError(errors)
+        return ''.join(output)
+
+    def _send(self, args):
+        """Send one command and return its output lines, or None if exiftool died."""
+        # Start exiftool on first use; launching it costs far more than a command
+        if self._process is None:
+            self._process = subprocess.Popen(
+                ['exiftool', '-stay_open', 'True', '-@', '-'],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                encoding='utf-8'
+            )
+        try:
+            self._process.stdin.write('\n'.join(args) + '\n-execute\n')
+            self._process.stdin.flush()
+        except OSError:
+            self._discard()
+            return None
+        
+        # Read until exiftool signals the command is done
+        output = []
+        while True:
+            line = self._process.stdout.readline()
+            if not line:
+                self._discard()
+                return None
+            if line.rstrip() == '{ready}':
+                return output
+            output.append(line)
+
+    def _discard(self):
+        """Kill and reap the exiftool process so the next command starts afresh."""
+        process, self._process = self._process, None
+        process.kill()
+        process.wait()
+
+    def close(self):
+        """Stop the exiftool process if it is running."""
+        if self._process is None:
+            return
+        process, self._process = self._process, None
+        try:
+            process.stdin.write('-stay_open\nFalse\n')
+            process.stdin.close()
+            process.wait(timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            # Already dead or stuck; never let shutdown mask a pipeline error
+            process.kill()
+            process.wait()
+
 class SnapchatProcessor:
     def __init__(self, zip_dir="zips", tmp_dir="tmp", media_dir="media"):
         self.zip_dir = Path(zip_dir)
         self.tmp_dir = Path(tmp_dir)
         self.media_dir = Path(media_dir)
         self.supported_extensions = {'.mp4', '.jpg', '.jpeg', '.png', '.webp'}
+        self._file_index = None
+        # exiftool processes are shared by the worker threads, one command each
+        self._idle_exiftools = queue.Queue()
+        self._exiftools = []
+        self._exiftools_lock = threading.Lock()
+        # Hardware encoders that failed once; ffmpeg lists NVENC even without a GPU
+        self._failed_encoders = set()
+        # Set once the CUDA overlay path has failed, which ffmpeg's listings can't predict
+        self._cuda_overlay_failed = False
+        # Video pairs encode in parallel; a launch over the session cap would
+        # fail and wrongly mark the GPU path as broken
+        self._hardware_encodes = threading.BoundedSemaphore(_MAX_HARDWARE_ENCODES)
+        # Lower-cased names claimed in media_dir this run; stages export concurrently
+        self._destinations = set()
+        self._destinations_lock = threading.Lock()
         
     def setup_directories(self):
         """Create necessary directories if they don't exist."""
@@ -38,213 +233,502 @@ class SnapchatProcessor:
     def extract_files(self):
         """Extract supported files from zip archives."""
         try:
+            # Members of all archives share one pool. They are keyed by target
+            # path so a name found twice is written once, by the last archive,
+            # as sequential extraction did, and never by two threads at once
+            members = {}
+            extensions = tuple(self.supported_extensions)
             for zip_file in self.zip_dir.glob('*.zip'):
                 logging.info(f"Processing zip file: {zip_file}")
                 with zipfile.ZipFile(zip_file) as zf:
                     for file_info in zf.infolist():
-                        if any(file_info.filename.lower().endswith(ext) for ext in self.supported_extensions):
-                            if 'thumbnail' not in file_info.filename.lower():
-                                zf.extract(file_info, self.tmp_dir)
-                                logging.info(f"Extracted: {file_info.filename}")
+                        filename = file_info.filename.lower()
+                        if filename.endswith(extensions) and 'thumbnail' not in filename:
+                            members[_member_path(file_info.filename)] = (zip_file, file_info)
+
+            # Create target folders up front so workers don't race on makedirs
+            folders = {os.path.dirname(path) for path in members}
+            for folder in folders:
+                (self.tmp_dir / folder).mkdir(parents=True, exist_ok=True)
+
+            # A ZipFile handle serializes reads, so every thread opens its own;
+            # zlib releases the GIL while inflating
+            local = threading.local()
+            handles = []
+            handles_lock = threading.Lock()
+
+            def extract_member(zip_file, file_info):
+                archives = getattr(local, 'archives', None)
+                if archives is None:
+                    archives = local.archives = {}
+                if zip_file not in archives:
+                    archives[zip_file] = zipfile.ZipFile(zip_file)
+                    with handles_lock:
+                        handles.append(archives[zip_file])
+                # The ZipInfo from the central directory scan is valid for any
+                # handle on the same archive and skips a name lookup
+                archives[zip_file].extract(file_info, self.tmp_dir)
+                return file_info.filename
+
+            try:
+                with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+                    futures = [
+                        executor.submit(extract_member, zip_file, file_info)
+                        for zip_file, file_info in members.values()
+                    ]
+                    # Log names at debug level and throttle progress lines, since
+                    # exports can hold tens of thousands of tiny members
+                    for count, future in enumerate(as_completed(futures), 1):
+                        logging.debug(f"Extracted: {future.result()}")
+                        if count % 64 == 0 or count == len(futures):
+                            logging.info(f"Extracted {count}/{len(futures)} files")
+            finally:
+                for handle in handles:
+                    handle.close()
+                # tmp_dir changed, so any earlier scan is stale
+                self._file_index = None
         except Exception as e:
             logging.error(f"Error during extraction: {str(e)}")
             raise
 
+    def _index_files(self):
+        """Walk tmp_dir once and group its files for each processing stage."""
+        if self._file_index is None:
+            index = {'html': {}, 'memories': [], 'media': []}
+            extensions = tuple(self.supported_extensions)
+            for entry, parents in _walk_files(self.tmp_dir):
+                # html/ and memories/ files are exported by their own stages only
+                if len(parents) == 2 and parents[0] == 'html':
+                    index['html'].setdefault(parents[1], []).append(Path(entry.path))
+                    continue
+                if parents == ('memories',):
+                    index['memories'].append(Path(entry.path))
+                    continue
+                name = entry.name.lower()
+                if name.endswith(extensions) and 'thumbnail' not in name:
+                    index['media'].append(entry)
+            self._file_index = index
+        return self._file_index
+
+    def _claim_destination(self, name):
+        """
+        Claim a path in media_dir for name, numbering it if another file
+        already claimed the name this run. Names are compared case-insensitively
+        since media_dir may live on a case-insensitive filesystem.
+        """
+        stem, suffix = os.path.splitext(name)
+        with self._destinations_lock:
+            candidate = name
+            counter = 1
+            while candidate.lower() in self._destinations:
+                candidate = f"{stem}-{counter}{suffix}"
+                counter += 1
+            self._destinations.add(candidate.lower())
+        return self.media_dir / candidate
+
     def process_html_files(self):
         """Process files from the HTML folder with proper renaming."""
-        html_dir = self.tmp_dir / 'html'
         try:
-            if html_dir.exists():
-                for folder in html_dir.iterdir():
-                    if folder.is_dir():
-                        for file in folder.glob('*.*'):
-                            if file.suffix.lower() in self.supported_extensions:
-                                new_name = f"{folder.name}{file.suffix.lower()}"
-                                shutil.copy2(file, self.media_dir / new_name)
-                                logging.info(f"Processed HTML file: {file} -> {new_name}")
+            for folder_name, files in self._index_files()['html'].items():
+                exported = set()
+                for file in files:
+                    suffix = file.suffix.lower()
+                    if suffix in self.supported_extensions:
+                        new_name = f"{folder_name}{suffix}"
+                        if new_name in exported:
+                            # Keep further files of the same type under their own name
+                            new_name = file.name
+                        exported.add(new_name)
+                        destination = self._claim_destination(new_name)
+                        # No other stage reads html/, so the file can be moved
+                        shutil.move(file, destination)
+                        logging.info(f"Processed HTML file: {file} -> {destination.name}")
         except Exception as e:
             logging.error(f"Error processing HTML files: {str(e)}")
             raise
 
+    def _run_exiftool(self, *args):
+        """Run an exiftool command on an idle daemon, starting one if none is free."""
+        try:
+            daemon = self._idle_exiftools.get_nowait()
+        except queue.Empty:
+            daemon = ExifToolDaemon()
+            with self._exiftools_lock:
+                self._exiftools.append(daemon)
+        try:
+            return daemon.execute(*args)
+        finally:
+            self._idle_exiftools.put(daemon)
+
+    def _close_exiftools(self):
+        """Stop all exiftool daemons started by this processor."""
+        with self._exiftools_lock:
+            for daemon in self._exiftools:
+                daemon.close()
+
     def _extract_date_from_filename(self, filename):
         """Extract date from filename pattern."""
-        date_pattern = r'(\d{4}-\d{2}-\d{2})'
-        match = re.search(date_pattern, filename)
+        # Snapchat names usually start with the date, which is then the first match
+        prefix = filename[:10]
+        if (len(prefix) == 10 and prefix[4] == '-' and prefix[7] == '-'
+                and (prefix[:4] + prefix[5:7] + prefix[8:]).isdecimal()):
+            return prefix
+        match = _DATE_RE.search(filename)
         if match:
             return match.group(1)
         return None
 
-    def apply_metadata(self, file_path):
-        """Apply metadata based on filename date."""
-        date_str = self._extract_date_from_filename(file_path.name)
-        if date_str:
+    def apply_metadata(self, *file_paths):
+        """
+        Apply metadata based on filename date.
+        Files that share a date are written by a single exiftool command.
+        """
+        files_by_date = {}
+        for file_path in file_paths:
+            date_str = self._extract_date_from_filename(file_path.name)
+            if date_str:
+                files_by_date.setdefault(date_str, []).append(file_path)
+
+        for date_str, paths in files_by_date.items():
+            failed = {}
             try:
                 # Convert date string to datetime
-                date_time = datetime.strptime(date_str, '%Y-%m-%d')
+                date_time = datetime.fromisoformat(date_str)
                 formatted_date = date_time.strftime('%Y:%m:%d %H:%M:%S')
-                timestamp = date_time.strftime('%Y%m%d%H%M.%S')
-                
-                # First use touch to set filesystem dates
-                subprocess.run([
-                    'touch',
-                    '-t',
-                    timestamp,
-                    str(file_path)
-                ], check=True)
+                timestamp = date_time.timestamp()
+            except ValueError as e:
+                logging.error(f"Error applying metadata to {', '.join(map(str, paths))}: {str(e)}")
+                continue
+
+            try:
+                # First set filesystem dates
+                self._set_file_dates(paths, timestamp, failed)
                 
-                # Then use exiftool to set all possible date fields
-                subprocess.run([
-                    'exiftool',
+                # Then use exiftool to strip metadata and set all date fields
+                self._run_exiftool(
                     '-overwrite_original',
                     '-all=',  # Remove all metadata
-                    str(file_path)
-                ], check=True)
-                
-                subprocess.run([
-                    'exiftool',
-                    '-overwrite_original',
                     f'-AllDates={formatted_date}',  # Set all date fields
-                    str(file_path)
-                ], check=True)
-                
-                # Set filesystem dates again to ensure they stick
-                subprocess.run([
-                    'touch',
-                    '-t',
-                    timestamp,
-                    str(file_path)
-                ], check=True)
-                
-                logging.info(f"Applied metadata to: {file_path}")
+                    *map(str, paths)
+                )
+            except ExifToolError as e:
+                # exiftool still writes the rest of the batch, so only the
+                # files named in its errors failed
+                by_name = {str(file_path): file_path for file_path in paths}
+                for error in e.errors:
+                    file_path = by_name.get(error.rsplit(' - ', 1)[-1])
+                    if file_path is not None:
+                        failed.setdefault(file_path, error)
+                if not failed:
+                    failed = dict.fromkeys(paths, str(e))
             except Exception as e:
-                logging.error(f"Error applying metadata to {file_path}: {str(e)}")
+                failed = dict.fromkeys(paths, str(e))
+            finally:
+                # Set filesystem dates again to ensure they stick, also when
+                # part of the batch failed
+                self._set_file_dates(paths, timestamp, failed)
+            
+            for file_path in paths:
+                if file_path in failed:
+                    logging.error(f"Error applying metadata to {file_path}: {failed[file_path]}")
+                else:
+                    logging.info(f"Applied metadata to: {file_path}")
+
+    def _set_file_dates(self, paths, timestamp, failed):
+        """Set the filesystem dates of paths, recording files that can't be set in failed."""
+        for file_path in paths:
+            try:
+                os.utime(file_path, (timestamp, timestamp))
+            except OSError as e:
+                failed.setdefault(file_path, str(e))
 
     def apply_overlay(self, main_file, overlay_file, output_file):
         """Apply overlay to main file."""
+        main_suffix = main_file.suffix.lower()
+        output_suffix = output_file.suffix.lower()
         try:
-            if main_file.suffix.lower() in {'.jpg', '.jpeg', '.png', '.webp'}:
+            if main_suffix in _IMAGE_EXTENSIONS and pyvips is not None:
+                # Process image with libvips, which streams and vectorizes the blend
+                base = pyvips.Image.new_from_file(str(main_file), access='sequential')
+                overlay = pyvips.Image.new_from_file(str(overlay_file))
+                # Resize overlay to match base image size
+                if (overlay.width, overlay.height) != (base.width, base.height):
+                    overlay = overlay.resize(
+                        base.width / overlay.width,
+                        vscale=base.height / overlay.height,
+                        kernel='linear'
+                    )
+                result = base.composite2(overlay, 'over')
+                # Favor speed over size for PNG, deflate dominates the save
+                save_options = {'compression': 1} if output_suffix == '.png' else {}
+                result.write_to_file(str(output_file), **save_options)
+            elif main_suffix in _IMAGE_EXTENSIONS:
                 # Process image
                 with Image.open(main_file) as base:
                     with Image.open(overlay_file) as overlay:
-                        # Resize overlay to match base image size
-                        overlay = overlay.resize(base.size)
-                        # Convert images to RGBA if they aren't already
-                        if base.mode != 'RGBA':
-                            base = base.convert('RGBA')
-                        if overlay.mode != 'RGBA':
-                            overlay = overlay.convert('RGBA')
-                        # Composite the images
-                        result = Image.alpha_composite(base, overlay)
-                        result.save(output_file)
-            elif main_file.suffix.lower() == '.mp4':
+                        # Resize overlay to match base image size; bilinear is
+                        # plenty for sticker/text overlays and much cheaper
+                        if overlay.size != base.size:
+                            overlay = overlay.resize(base.size, Image.BILINEAR)
+                        if np is not None and base.mode == 'RGB':
+                            # Opaque base: blend directly in NumPy
+                            result = self._blend_opaque(base, overlay)
+                        else:
+                            # Convert images to RGBA if they aren't already
+                            if base.mode != 'RGBA':
+                                base = base.convert('RGBA')
+                            if overlay.mode != 'RGBA':
+                                overlay = overlay.convert('RGBA')
+                            # Composite the overlay onto the base
+                            result = Image.alpha_composite(base, overlay)
+                        if result.mode == 'RGBA' and output_suffix in _JPEG_EXTENSIONS:
+                            result = self._flatten_for_jpeg(result)
+                        # Favor speed over size for PNG, deflate dominates the save
+                        save_options = {'compress_level': 1} if output_suffix == '.png' else {}
+                        result.save(output_file, **save_options)
+            elif main_suffix == '.mp4':
                 # Process video using ffmpeg
-                overlay_path = str(overlay_file)
-                main_input = ffmpeg.input(str(main_file))
-                overlay_input = ffmpeg.input(overlay_path)
-                
-                ffmpeg.filter(
-                    [main_input, overlay_input],
-                    'overlay',
-                    'overlay'
-                ).output(
-                    str(output_file)
-                ).overwrite_output().run()
+                self._apply_video_overlay(main_file, overlay_file, output_file)
             
             logging.info(f"Applied overlay: {main_file} + {overlay_file} -> {output_file}")
         except Exception as e:
             logging.error(f"Error applying overlay: {str(e)}")
             raise
 
+    def _flatten_for_jpeg(self, image):
+        """Drop the alpha channel of an RGBA image so it can be saved as JPEG."""
+        alpha = image.getchannel('A')
+        if alpha.getextrema()[0] == 255:
+            # Fully opaque, the alpha channel can simply be discarded
+            return image.convert('RGB')
+        background = Image.new('RGB', image.size, 'WHITE')
+        background.paste(image, mask=alpha)
+        return background
+
+    def _blend_opaque(self, base, overlay):
+        """Alpha-blend an RGBA overlay onto an opaque RGB base of the same size."""
+        if overlay.mode != 'RGBA':
+            overlay = overlay.convert('RGBA')
+        main = np.asarray(base, dtype=np.uint16)
+        ovl = np.asarray(overlay, dtype=np.uint16)
+        alpha = ovl[..., 3:4]
+        # out = main * (1 - a) + overlay * a, in integer arithmetic with rounding
+        blended = (main * (255 - alpha) + ovl[..., :3] * alpha + 127) // 255
+        return Image.fromarray(blended.astype(np.uint8), 'RGB')
+
+    def _apply_video_overlay(self, main_file, overlay_file, output_file):
+        """Overlay an image onto a video, preferring GPU and hardware encoding."""
+        if not self._cuda_overlay_failed and _cuda_overlay_available():
+            try:
+                with self._hardware_encodes:
+                    self._run_cuda_video_overlay(main_file, overlay_file, output_file)
+                return
+            except subprocess.CalledProcessError:
+                # Don't pay for a failing launch on every later video
+                self._cuda_overlay_failed = True
+                logging.warning(f"CUDA overlay failed, using the CPU for this run: {main_file}")
+
+        encoder = _hardware_video_encoder(exclude=self._failed_encoders)
+        try:
+            with self._hardware_encodes if encoder else contextlib.nullcontext():
+                self._run_video_overlay(main_file, overlay_file, output_file, encoder)
+        except subprocess.CalledProcessError:
+            if encoder is None:
+                raise
+            # Don't pay for a failing launch on every later video
+            self._failed_encoders.add(encoder)
+            logging.warning(f"Hardware encoder {encoder} failed, using software for this run: {main_file}")
+            self._run_video_overlay(main_file, overlay_file, output_file)
+
+    def _run_ffmpeg(self, inputs, filter_graph, output_file, codec_args):
+        """Run a single ffmpeg overlay encode, copying audio and metadata from input 0."""
+        subprocess.run([
+            'ffmpeg',
+            '-hide_banner',
+            '-loglevel', 'error',
+            '-y',
+            *inputs,
+            '-filter_complex', filter_graph,
+            '-map', '[v]',
+            '-map', '0:a?',  # Audio is optional
+            *codec_args,
+            '-c:a', 'copy',
+            '-map_metadata', '0',
+            str(output_file)
+        ], check=True, stdin=subprocess.DEVNULL)
+
+    def _run_cuda_video_overlay(self, main_file, overlay_file, output_file):
+        """Overlay an image onto a video with NVDEC, overlay_cuda and NVENC."""
+        # Frames stay in GPU memory from decode through encode
+        self._run_ffmpeg(
+            [
+                '-hwaccel', 'cuda',
+                '-hwaccel_output_format', 'cuda',
+                '-i', str(main_file),
+                '-i', str(overlay_file)
+            ],
+            '[1:v]format=yuva420p,hwupload_cuda[ov];[0:v][ov]overlay_cuda[v]',
+            output_file,
+            ['-c:v', 'h264_nvenc', *_HARDWARE_ENCODER_ARGS['h264_nvenc']]
+        )
+
+    def _run_video_overlay(self, main_file, overlay_file, output_file, encoder=None):
+        """Overlay an image onto a video with ffmpeg."""
+        if encoder:
+            codec_args = ['-c:v', encoder, *_HARDWARE_ENCODER_ARGS[encoder]]
+        elif 'libx264' in _ffmpeg_listing('-encoders'):
+            codec_args = ['-c:v', 'libx264', '-preset', 'veryfast']
+        else:
+            codec_args = []
+        # Several encodes run side by side, so cap each one's thread fan-out
+        codec_args += ['-threads', '2']
+        
+        self._run_ffmpeg(
+            ['-i', str(main_file), '-i', str(overlay_file)],
+            '[0:v][1:v]overlay[v]',
+            output_file,
+            codec_args
+        )
+
     def process_memories(self):
         """Process memories folder, applying overlays where applicable."""
-        memories_dir = self.tmp_dir / 'memories'
         try:
-            if memories_dir.exists():
-                # Group files by their UUID
+            memory_files = self._index_files()['memories']
+            if memory_files:
+                # Index main and overlay files by their UUID in a single pass
                 files_by_uuid = {}
-                for file in memories_dir.iterdir():
-                    if file.is_file():
-                        # Extract UUID from filename
-                        uuid_match = re.search(r'(\d{4}-\d{2}-\d{2})_([^-]+)', file.name)
-                        if uuid_match:
-                            date, file_uuid = uuid_match.groups()
-                            if file_uuid not in files_by_uuid:
-                                files_by_uuid[file_uuid] = {'date': date, 'files': []}
-                            files_by_uuid[file_uuid]['files'].append(file)
-
-                # Process each group
+                unpaired = []
+                for file in memory_files:
+                    # Cheap substring check before running the regex
+                    if '-main.' in file.name:
+                        role = 'main'
+                    elif '-overlay.' in file.name:
+                        role = 'overlay'
+                    else:
+                        unpaired.append(file)
+                        continue
+                    # Extract UUID from filename
+                    uuid_match = _MEMORY_RE.search(file.name)
+                    if uuid_match:
+                        date, file_uuid = uuid_match.groups()
+                        group = files_by_uuid.setdefault(
+                            file_uuid,
+                            {'date': date, 'main': None, 'overlay': None}
+                        )
+                        if group[role] is None:
+                            group[role] = file
+                            continue
+                    unpaired.append(file)
+
+                # Collect complete main/overlay pairs
+                image_pairs = []
+                video_pairs = []
                 for file_uuid, group in files_by_uuid.items():
-                    main_file = next((f for f in group['files'] if 'main' in f.name), None)
-                    overlay_file = next((f for f in group['files'] if 'overlay' in f.name), None)
+                    main_file = group['main']
+                    overlay_file = group['overlay']
 
                     if main_file and overlay_file:
-                        # Handle original file
-                        original_name = main_file.name.replace('-main', '-original')
-                        original_path = self.media_dir / original_name
-                        
-                        # Copy with appropriate metadata handling
-                        if main_file.suffix.lower() == '.mp4':
-                            # For videos, use ffmpeg to copy while preserving metadata
-                            ffmpeg.input(str(main_file)).output(
-                                str(original_path),
-                                codec='copy',
-                                map_metadata=0
-                            ).overwrite_output().run()
-                        else:
-                            # For images, copy and apply date-based metadata
-                            shutil.copy2(main_file, original_path)
-                            self.apply_metadata(original_path)
-
-                        # Create overlaid version
-                        overlay_name = main_file.name.replace('-main', '-with-overlay')
-                        overlay_path = self.media_dir / overlay_name
-                        
-                        # Apply overlay with metadata handling
-                        self.apply_overlay(
-                            main_file,
-                            overlay_file,
-                            overlay_path
-                        )
-                        
-                        # Handle metadata for overlaid version
                         if main_file.suffix.lower() == '.mp4':
-                            # Extract metadata from original video and apply to overlaid version
-                            subprocess.run([
-                                'exiftool',
-                                '-overwrite_original',
-                                f'-tagsFromFile',
-                                str(main_file),
-                                str(overlay_path)
-                            ], check=True)
+                            video_pairs.append((main_file, overlay_file))
                         else:
-                            # For images, apply date-based metadata
-                            self.apply_metadata(overlay_path)
-                        
-                        logging.info(f"Processed memory pair: {main_file.name}")
+                            image_pairs.append((main_file, overlay_file))
+                    else:
+                        unpaired.append(main_file or overlay_file)
+
+                # Memories without a partner are exported like any other media file
+                extensions = tuple(self.supported_extensions)
+                for file in unpaired:
+                    name = file.name.lower()
+                    if name.endswith(extensions) and 'thumbnail' not in name:
+                        self._process_media_file(file)
+
+                # Image compositing is CPU-bound and Pillow releases the GIL in
+                # its decode/blend/encode loops, so image pairs run in parallel
+                with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+                    list(executor.map(lambda pair: self._process_memory_pair(*pair), image_pairs))
+
+                # ffmpeg threads each encode itself, so run fewer videos at once
+                with ThreadPoolExecutor(max_workers=max(1, (os.cpu_count() or 1) // 2)) as executor:
+                    list(executor.map(lambda pair: self._process_memory_pair(*pair), video_pairs))
         except Exception as e:
             logging.error(f"Error processing memories: {str(e)}")
             raise
 
+    def _process_memory_pair(self, main_file, overlay_file):
+        """Export the original and the overlaid version of a memory."""
+        # Handle original file
+        original_name = main_file.name.replace('-main', '-original')
+        original_path = self._claim_destination(original_name)
+
+        # For videos, a plain file move keeps the streams without the
+        # demux/remux pass of an ffmpeg stream copy. No other stage reads
+        # memories/, so the main file can be moved. Both versions get their
+        # dates rewritten below, so a cross-device move skips copystat
+        shutil.move(main_file, original_path, copy_function=shutil.copyfile)
+
+        # Create overlaid version
+        overlay_name = main_file.name.replace('-main', '-with-overlay')
+        overlay_path = self._claim_destination(overlay_name)
+
+        # Apply overlay with metadata handling
+        self.apply_overlay(
+            original_path,
+            overlay_file,
+            overlay_path
+        )
+
+        # Apply date-based metadata to both versions in one batch
+        self.apply_metadata(original_path, overlay_path)
+
+        logging.info(f"Processed memory pair: {main_file.name}")
+
+    def process_media_files(self):
+        """Copy supported media files and apply date-based metadata."""
+        try:
+            # Workers borrow an idle exiftool daemon per file, so they don't queue on one
+            with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+                list(executor.map(self._process_media_file, self._index_files()['media']))
+        except Exception as e:
+            logging.error(f"Error processing media files: {str(e)}")
+            raise
+
+    def _process_media_file(self, file):
+        """Move a single media file (DirEntry or Path) and apply its date-based metadata."""
+        destination = self._claim_destination(file.name)
+        # apply_metadata rewrites the dates of dated files, so copying their
+        # stat info is wasted work when the move has to fall back to a copy
+        dated = self._extract_date_from_filename(file.name) is not None
+        # tmp_dir is scratch space; this is a rename when it shares a filesystem with media_dir
+        shutil.move(os.fspath(file), destination,
+                    copy_function=shutil.copyfile if dated else shutil.copy2)
+        self.apply_metadata(destination)
+
     def process_all(self):
         """Run the complete processing pipeline."""
         try:
             logging.info("Starting Snapchat data processing")
             self.setup_directories()
+            self._destinations.clear()
             self.extract_files()
-            self.process_html_files()
+            self._index_files()
             
-            # Process files with date-based metadata
-            for file in self.tmp_dir.rglob('*.*'):
-                if file.suffix.lower() in self.supported_extensions:
-                    if 'thumbnail' not in file.name.lower():
-                        shutil.copy2(file, self.media_dir)
-                        self.apply_metadata(self.media_dir / file.name)
+            # The remaining stages each own a disjoint part of tmp_dir and write
+            # differently named files to media_dir, so they run concurrently
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                stages = [
+                    executor.submit(self.process_html_files),
+                    executor.submit(self.process_media_files),
+                    executor.submit(self.process_memories)
+                ]
+                for stage in stages:
+                    stage.result()
             
-            self.process_memories()
             logging.info("Completed Snapchat data processing")
         except Exception as e:
             logging.error(f"Error in processing pipeline: {str(e)}")
             raise
+        finally:
+            self._close_exiftools()
 
 if __name__ == "__main__":
     processor = SnapchatProcessor()